@@ -1,14 +1,26 @@
 import argparse
 import csv
 import gzip
+import io
 import json
 import os
-import shutil
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
 from pathlib import Path
 
 import yaml
 
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+DEFAULT_COMPRESSION_LEVEL = 1
+
+
 def load_yaml(path):
     with open(path, "r") as f:
         return yaml.safe_load(f)
@@ -23,38 +35,131 @@ def load_fields(core_schema_path, source_schema_path):
     ]
 
 
-def gzip_compress(input_file):
-    with open(input_file, "rb") as f_in:
-        with open(Path(input_file.parent) / (input_file.name + ".gz"), "wb") as f_out:
-            with gzip.GzipFile(fileobj=f_out, mode="wb", mtime=0) as gz:
-                shutil.copyfileobj(f_in, gz)
+def json_dumps(obj, indent=False, newline=False):
+    # Serialize to UTF-8 bytes, with orjson when it's installed. The stdlib
+    # fallback produces identical output.
+    if orjson:
+        option = orjson.OPT_INDENT_2 if indent else 0
+        if newline:
+            option |= orjson.OPT_APPEND_NEWLINE
+        return orjson.dumps(obj, option=option)
+    s = json.dumps(
+        obj,
+        indent=2 if indent else None,
+        separators=(",", ": ") if indent else (",", ":"),
+        ensure_ascii=False,
+    )
+    return (s + "\n" if newline else s).encode("utf-8")
+
+
+class TeeWriter:
+    def __init__(self, *files):
+        self.files = files
+
+    def write(self, s):
+        for f in self.files:
+            f.write(s)
+
+    def writelines(self, lines):
+        # The lines may be a one-shot iterator, so hand them to every file in
+        # batches rather than one write per line
+        lines = iter(lines)
+        while batch := list(islice(lines, 1000)):
+            for f in self.files:
+                f.writelines(batch)
+
+
+@contextmanager
+def open_with_gz(
+    path, binary=False, newline=None, compresslevel=DEFAULT_COMPRESSION_LEVEL
+):
+    # Writes go to both path and path.gz, so the compressed copy is produced in
+    # the same pass instead of re-reading the file afterwards
+    gz_path = Path(path.parent) / (path.name + ".gz")
+    with (
+        open(path, "wb") as f,
+        open(gz_path, "wb") as f_gz,
+        gzip.GzipFile(
+            fileobj=f_gz, mode="wb", compresslevel=compresslevel, mtime=0
+        ) as gz,
+    ):
+        if binary:
+            yield TeeWriter(f, gz)
+            return
+        with (
+            io.TextIOWrapper(f, encoding="utf-8", newline=newline) as f_text,
+            io.TextIOWrapper(gz, encoding="utf-8", newline=newline) as gz_text,
+        ):
+            yield TeeWriter(f_text, gz_text)
+
+
+def write_artifact(
+    path,
+    write_fn,
+    data,
+    *args,
+    binary=False,
+    newline=None,
+    compresslevel=DEFAULT_COMPRESSION_LEVEL,
+):
+    with open_with_gz(
+        path, binary=binary, newline=newline, compresslevel=compresslevel
+    ) as f:
+        write_fn(data, f, *args)
+
+
+def load_csv_header(filepath):
+    with open(filepath, newline="", encoding="utf-8") as f:
+        return next(csv.reader(f))
 
 
-def load_csv(filepath):
+def load_csv(filepath, fields):
+    # Read rows straight into dicts of the wanted fields, skipping fields that
+    # aren't in the file and mapping empty values to None. As with DictReader,
+    # blank lines are skipped and fields missing from short rows are None.
     with open(filepath, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        return list(reader)
+        reader = csv.reader(f)
+        header = next(reader)
+        field_idx = [(k, header.index(k)) for k in fields if k in header]
+        return [
+            {k: (row[i] or None) if i < len(row) else None for k, i in field_idx}
+            for row in reader
+            if row
+        ]
+
+
+def write_csv(data, f, fields):
+    writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+    writer.writeheader()
+    writer.writerows(data)
+
 
+def write_json(data, f, minified=False):
+    f.write(json_dumps(data, indent=not minified))
 
-def write_csv(data, filename, fields):
-    with open(filename, "w", newline="") as csvfile:
-        writer = csv.DictWriter(csvfile, fieldnames=fields, extrasaction="ignore")
-        writer.writeheader()
-        writer.writerows(data)
-    return filename
 
+def write_json_rows(data, f):
+    # Same output as indented json_dumps on the list, but encoded one row at a
+    # time so the whole array is never built up as a single buffer
+    empty = True
+    for row in data:
+        f.write(b"[\n  " if empty else b",\n  ")
+        f.write(json_dumps(row, indent=True).replace(b"\n", b"\n  "))
+        empty = False
+    f.write(b"[]" if empty else b"\n]")
 
-def write_json(data, filepath, minified=False):
-    with open(filepath, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=None if minified else 2, ensure_ascii=False)
-    return filepath
 
+def encode_ndjson_lines(data):
+    return [json_dumps(row, newline=True) for row in data]
 
-def write_ndjson(data, filepath):
-    with open(filepath, "w", encoding="utf-8") as f:
-        for row in data:
-            f.write(json.dumps(row, ensure_ascii=False) + "\n")
-    return filepath
+
+def write_ndjson(lines, f):
+    f.writelines(lines)
+
+
+def write_min_json(lines, f):
+    # A compact JSON array is the NDJSON lines joined by "," instead of "\n"
+    f.write(b"[" + b",".join(memoryview(line)[:-1] for line in lines) + b"]")
 
 
 # def write_parquet(data, filename):
@@ -62,48 +167,150 @@ def write_ndjson(data, filepath):
 #    df.to_parquet(filename, engine='pyarrow', compression='snappy')
 
 
-def write_id_mappings(data, output_dir, id_fields):
+def project_prism_id(row):
+    return row["prism_id"]
+
+
+def project_full_row(row):
+    return row
+
+
+def write_id_mappings(
+    data,
+    output_dir,
+    id_fields,
+    projection=project_prism_id,
+    compresslevel=DEFAULT_COMPRESSION_LEVEL,
+):
+    # Each mapping is {id value: projection(row)}. By default that's just the
+    # prism_id, which clients resolve against players.min.json.
     os.makedirs(output_dir, exist_ok=True)
-    for id_field in id_fields:
-        mapping = {}
-        for row in data:
+    # Bucket every id field in a single pass over the rows
+    mappings = {id_field: {} for id_field in id_fields}
+    for row in data:
+        value = projection(row)
+        for id_field, mapping in mappings.items():
             id_value = row.get(id_field)
             if id_value:
-                mapping[id_value] = row
+                mapping[id_value] = value
+
+    for id_field, mapping in mappings.items():
         if not mapping:
             continue
-        gzip_compress(
-            write_json(
-                mapping, Path(output_dir) / f"players.{id_field}.json", minified=False
-            )
+        write_artifact(
+            Path(output_dir) / f"players.{id_field}.json",
+            write_json,
+            mapping,
+            False,
+            binary=True,
+            compresslevel=compresslevel,
         )
-        gzip_compress(
-            write_json(
-                mapping,
-                Path(output_dir) / f"players.{id_field}.min.json",
-                minified=True,
-            )
+        write_artifact(
+            Path(output_dir) / f"players.{id_field}.min.json",
+            write_json,
+            mapping,
+            True,
+            binary=True,
+            compresslevel=compresslevel,
         )
 
 
-def write_all(data, output_dir, fields):
-    write_csv(data, output_dir / "players.csv", fields)
-    gzip_compress(output_dir / "players.csv")
-
-    write_json(data, output_dir / "players.json", minified=False)
-    gzip_compress(output_dir / "players.json")
-
-    write_json(data, output_dir / "players.min.json", minified=True)
-    gzip_compress(output_dir / "players.min.json")
-
-    write_ndjson(data, output_dir / "players.ndjson")
-    gzip_compress(output_dir / "players.ndjson")
-
-    # write_parquet(data, output_dir / "players.parquet")
-
-    # Detect all *_id columns
-    id_fields = [key for key in data[0] if key and key.endswith("_id")]
-    write_id_mappings(data, output_dir / "by_id", id_fields)
+def write_csv_export(data, output_dir, fields, compresslevel):
+    write_artifact(
+        output_dir / "players.csv",
+        write_csv,
+        data,
+        fields,
+        newline="",
+        compresslevel=compresslevel,
+    )
+
+
+def write_json_export(data, output_dir, compresslevel):
+    write_artifact(
+        output_dir / "players.json",
+        write_json_rows,
+        data,
+        binary=True,
+        compresslevel=compresslevel,
+    )
+
+
+def write_compact_exports(data, output_dir, compresslevel):
+    # players.min.json and players.ndjson hold the same compact encoding of
+    # each row, so rows are encoded once and shared by both
+    ndjson_lines = encode_ndjson_lines(data)
+    write_artifact(
+        output_dir / "players.min.json",
+        write_min_json,
+        ndjson_lines,
+        binary=True,
+        compresslevel=compresslevel,
+    )
+    write_artifact(
+        output_dir / "players.ndjson",
+        write_ndjson,
+        ndjson_lines,
+        binary=True,
+        compresslevel=compresslevel,
+    )
+
+
+# Rows of each export variant ("full" and "ids"), loaded once per worker
+# process by init_worker so they're never pickled along with a task
+worker_rows = {}
+# An exception raised by an initializer breaks the whole pool, and the parent
+# only sees BrokenProcessPool. init_worker keeps the error here instead, and
+# run_task re-raises it so the parent gets the real exception.
+worker_error = None
+
+
+def init_worker(csv_path, fields, id_fields):
+    global worker_error
+    try:
+        # Skip non-active fields
+        data = load_csv(csv_path, fields)
+    except Exception as e:
+        worker_error = e
+        return
+    worker_rows["full"] = data
+    # Strip non-id cols
+    worker_rows["ids"] = [{k: d[k] for k in id_fields} for d in data]
+
+
+def run_task(variant, task, *args):
+    if worker_error is not None:
+        raise worker_error
+    task(worker_rows[variant], *args)
+
+
+def export_tasks(
+    variant,
+    output_dir,
+    fields,
+    id_fields,
+    compresslevel=DEFAULT_COMPRESSION_LEVEL,
+    by_id_full=False,
+):
+    # Every artifact is independent, so each one (and each by_id mapping) is a
+    # separate (variant, task, *args) to run on the process pool
+    projection = project_full_row if by_id_full else project_prism_id
+    return [
+        (variant, write_csv_export, output_dir, fields, compresslevel),
+        (variant, write_json_export, output_dir, compresslevel),
+        (variant, write_compact_exports, output_dir, compresslevel),
+        # write_parquet(data, output_dir / "players.parquet")
+    ] + [
+        (
+            variant,
+            write_id_mappings,
+            output_dir / "by_id",
+            [id_field],
+            projection,
+            compresslevel,
+        )
+        for id_field in id_fields
+    ]
 
 
 def main():
@@ -112,6 +319,18 @@ def main():
     parser.add_argument("output_dir", help="Where to write the output files")
     parser.add_argument("--core-schema", default="schema/players.yaml")
     parser.add_argument("--source-schema", default="schema/leagues/mlb/sources.yaml")
+    parser.add_argument(
+        "--compression-level",
+        type=int,
+        choices=range(0, 10),
+        default=DEFAULT_COMPRESSION_LEVEL,
+        help="gzip compression level for the .gz outputs (0-9)",
+    )
+    parser.add_argument(
+        "--by-id-full",
+        action="store_true",
+        help="Map each id to the full player row in by_id/ instead of its prism_id",
+    )
     args = parser.parse_args()
 
     fields = load_fields(args.core_schema, args.source_schema)
@@ -122,19 +341,24 @@ def main():
     ids_dir = (Path(args.output_dir) / "players") / "ids"
     os.makedirs(ids_dir, exist_ok=True)
 
-    data = load_csv(args.csv)
-    # Skip non-active fields
-    data = [{k: d[k] or None for k in fields if k in d} for d in data]
-
-    # Full Output formats
-    write_all(data, full_dir, fields)
-
-    # Strip non-id cols
-    for d in data:
-        for key in list(d.keys()):
-            if key and not key.endswith("_id"):
-                del d[key]
-    write_all(data, ids_dir, fields)
+    # Detect all *_id columns
+    header = load_csv_header(args.csv)
+    id_fields = [k for k in fields if k in header and k.endswith("_id")]
+
+    # Full Output formats, then id-only formats
+    tasks = export_tasks(
+        "full", full_dir, fields, id_fields, args.compression_level, args.by_id_full
+    ) + export_tasks(
+        "ids", ids_dir, fields, id_fields, args.compression_level, args.by_id_full
+    )
+    with ProcessPoolExecutor(
+        max_workers=min(len(tasks), os.cpu_count() or 1),
+        initializer=init_worker,
+        initargs=(args.csv, fields, id_fields),
+    ) as executor:
+        futures = [executor.submit(run_task, *task) for task in tasks]
+        for future in futures:
+            future.result()
 
 
 if __name__ == "__main__":
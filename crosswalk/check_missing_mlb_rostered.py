@@ -4,7 +4,6 @@ import json
 import os
 import sys
 import time
-from datetime import datetime
 from pathlib import Path
 
 import requests
@@ -101,7 +100,7 @@ def write_issues_txt(issues: list[dict], outfile_path: str = "issues.txt") -> No
     - mlbam_id
     - name
     """
-    now = datetime.utcnow().isoformat()
+    now = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime())
     header = [
         "## 🔍 Missing Players from MLB 40-Man Rosters",
         "",
@@ -113,21 +112,15 @@ def write_issues_txt(issues: list[dict], outfile_path: str = "issues.txt") -> No
         "|----------|--------------|",
     ]
 
-    table_rows = []
-    csv_rows = []
-    for issue in issues:
-        table_rows.append(f"| {issue['mlbam_id']} | {issue['name']} |")
-        # CSV update line (prism_id,new_fg_id)
-        csv_rows.append(f"{issue['mlbam_id']}, {issue['name']}")
-
-    csv_section = [
+    csv_section_start = [
         "",
         "### Suggested Edits",
         "",
         "You may want to insert the following rows in `players.csv`:",
         "",
         "```csv",
-        *csv_rows,
+    ]
+    csv_section_end = [
         "```",
         "",
         "Please verify manually before updating.",
@@ -138,7 +131,14 @@ def write_issues_txt(issues: list[dict], outfile_path: str = "issues.txt") -> No
     ]
 
     with open(outfile_path, "w") as f:
-        f.write("\n".join(header + table_rows + csv_section))
+        f.write("\n".join(header))
+        for issue in issues:
+            f.write(f"\n| {issue['mlbam_id']} | {issue['name']} |")
+        f.write("\n" + "\n".join(csv_section_start))
+        for issue in issues:
+            # CSV update line (prism_id,new_fg_id)
+            f.write(f"\n{issue['mlbam_id']}, {issue['name']}")
+        f.write("\n" + "\n".join(csv_section_end))
 
 
 def load_csv_header(path: Path) -> list[str]:
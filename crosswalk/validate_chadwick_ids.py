@@ -1,12 +1,16 @@
 import argparse
 import csv
+import gzip
 import os
 import sys
-from datetime import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 
 import requests
 import yaml
+from requests.adapters import HTTPAdapter
 
 
 CACHE_DIR = "cache/chadwick"
@@ -31,29 +35,43 @@ def load_id_map(yaml_path):
         return yaml.safe_load(f)
 
 
-def download_chadwick_data(suffix, refresh=False):
+def make_session(pool_size):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    return session
+
+
+def download_chadwick_data(suffix, refresh=False, session=requests):
     os.makedirs(CACHE_DIR, exist_ok=True)
-    path = Path(os.path.join(CACHE_DIR, f"people-{suffix}.csv"))
+    # Cached gzipped, shards are several MB of plain CSV each
+    path = Path(os.path.join(CACHE_DIR, f"people-{suffix}.csv.gz"))
 
     if not path.exists() or refresh:
         print(f"[chadwick] Downloading people-{suffix}.csv")
         url = SOURCE_URL_TEMPLATE.format(suffix=suffix)
-        response = requests.get(url)
+        response = session.get(url)
         response.raise_for_status()
         with open(path, "wb") as f:
-            f.write(response.content)
+            f.write(gzip.compress(response.content, compresslevel=1))
     else:
         # print(f"[chadwick] Using cached file for people-{suffix}")
         pass
 
     people = {}
-    # Load from disk
-    with open(path, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+    # Load from disk, keeping only the MAPPINGS columns (in MAPPINGS order) of
+    # rows that have an MLBAM id
+    with gzip.open(path, "rt", newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        idx_mlbam = header.index("key_mlbam")
+        idx_mapped = [header.index(key) for key in MAPPINGS]
         for row in reader:
-            key = row["key_mlbam"].strip()
+            if not row:
+                continue
+            key = row[idx_mlbam].strip()
             if key:
-                people[key] = row
+                people[key] = [row[i] for i in idx_mapped]
     return people
 
 
@@ -69,7 +87,7 @@ def write_issues_txt(issues: list[dict], outfile_path: str = "issues.txt") -> No
     - chadwick_value
     - prism_value
     """
-    now = datetime.utcnow().isoformat()
+    now = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime())
     header = [
         "## 📋 Chadwick differences found",
         "",
@@ -81,16 +99,14 @@ def write_issues_txt(issues: list[dict], outfile_path: str = "issues.txt") -> No
         "|----------|--------------|-----------|----------------|-------------|",
     ]
 
-    table_rows = []
-    for issue in issues:
-        table_rows.append(
-            f"| {issue['prism_id']} | {issue['last_name']}, {issue['first_name']} "
-            f"| {issue['prism_key']} | {issue['chadwick_value']} "
-            f"| {issue.get('prism_value', '')} |"
-        )
-
     with open(outfile_path, "w") as f:
-        f.write("\n".join(header + table_rows))
+        f.write("\n".join(header))
+        for issue in issues:
+            f.write(
+                f"\n| {issue['prism_id']} | {issue['last_name']}, {issue['first_name']} "
+                f"| {issue['prism_key']} | {issue['chadwick_value']} "
+                f"| {issue.get('prism_value', '')} |"
+            )
 
 
 def validate_csv(
@@ -99,6 +115,7 @@ def validate_csv(
     quiet: bool = False,
     issues_file: str = None,
     ignores_file: str = None,
+    verbose: bool = False,
 ):
     issues = []
     matches = 0
@@ -106,79 +123,99 @@ def validate_csv(
 
     ignores = load_id_map(ignores_file) if ignores_file else {}
 
-    for suffix in HEX_SUFFIXES:
-        chadwick_by_mlbam = download_chadwick_data(suffix)
-
-        with open(csv_path, newline="", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for idx, row in enumerate(reader, start=1):
-                rows += 1
-                if idx < start:
-                    continue
-                mlbam_id = row.get("mlbam_id", None)
-                prism_id = row.get("prism_id", None)
-
-                found = chadwick_by_mlbam.get(mlbam_id, None)
-                if not found:
-                    # not in chadwick, skip
-                    continue
-                else:
-                    matches += 1
-
-                # Check our ID mappings against chadwick's items
-                for chadwick_key, our_key in MAPPINGS.items():
-                    ignore_key = False
-                    if ignores.get(prism_id, None):
-                        if our_key in ignores[prism_id] or ignores[prism_id] == our_key:
-                            print(f"Row {idx}, {prism_id}: Ignoring {our_key}")
-                            ignore_key = True
-                    chadwick_val = found.get(chadwick_key, None)
-                    our_val = row.get(our_key, None)
-
-                    if our_key == "fangraphs_id" and our_val != chadwick_val:
-                        # HACK special handling of fangraphs_id differences
-                        if not our_val.startswith("sa") and chadwick_val.startswith(
-                            "sa"
-                        ):
-                            # assume our non-sa value is correct if chadwick has a sa prefix
-                            continue
-                    if not our_val and chadwick_val:
-                        # present in Chadwick, not in PRISM
+    # Merge all shards into one lookup so the PRISM CSV is only read once.
+    # Shards are fetched concurrently, the downloads are network-bound.
+    chadwick_by_mlbam = {}
+    with (
+        make_session(len(HEX_SUFFIXES)) as session,
+        ThreadPoolExecutor(max_workers=len(HEX_SUFFIXES)) as executor,
+    ):
+        load = partial(download_chadwick_data, session=session)
+        for people in executor.map(load, HEX_SUFFIXES):
+            chadwick_by_mlbam.update(people)
+
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        width = len(header)
+        idx_prism = header.index("prism_id")
+        idx_mlbam = header.index("mlbam_id")
+        idx_last_name = header.index("last_name")
+        idx_first_name = header.index("first_name")
+        our_columns = [
+            (our_key, header.index(our_key)) for our_key in MAPPINGS.values()
+        ]
+        # Blank lines are skipped (and not counted), as DictReader did
+        for idx, row in enumerate(filter(None, reader), start=1):
+            rows += 1
+            if idx < start:
+                continue
+            if len(row) < width:
+                # Fields past the end of a short row are None, as in DictReader
+                row += [None] * (width - len(row))
+            mlbam_id = row[idx_mlbam]
+            prism_id = row[idx_prism]
+
+            found = chadwick_by_mlbam.get(mlbam_id, None)
+            if not found:
+                # not in chadwick, skip
+                continue
+            else:
+                matches += 1
+
+            # Check our ID mappings against chadwick's items
+            ignored_keys = ignores.get(prism_id) or ()
+            for (our_key, idx_our), chadwick_val in zip(our_columns, found):
+                ignore_key = our_key in ignored_keys or ignored_keys == our_key
+                if ignore_key and verbose:
+                    print(f"Row {idx}, {prism_id}: Ignoring {our_key}")
+                our_val = row[idx_our]
+
+                if our_key == "fangraphs_id" and our_val != chadwick_val:
+                    # HACK special handling of fangraphs_id differences
+                    if not (our_val or "").startswith("sa") and (
+                        chadwick_val or ""
+                    ).startswith("sa"):
+                        # assume our non-sa value is correct if chadwick has a sa prefix
+                        continue
+                if not our_val and chadwick_val:
+                    # present in Chadwick, not in PRISM
+                    if not quiet:
                         print(
                             f"Row {idx}, {prism_id}: Missing {our_key}, "
                             f"Chadwick has {chadwick_val}. "
                             f"ignoring: {ignore_key}"
                         )
-                        if not ignore_key:
-                            issues.append(
-                                {
-                                    "prism_id": prism_id,
-                                    "last_name": row["last_name"],
-                                    "first_name": row["first_name"],
-                                    "prism_key": our_key,
-                                    "chadwick_value": chadwick_val,
-                                    "prism_value": our_val,
-                                }
-                            )
-                    elif chadwick_val and chadwick_val != our_val:
-                        # Mismatch
+                    if not ignore_key:
+                        issues.append(
+                            {
+                                "prism_id": prism_id,
+                                "last_name": row[idx_last_name],
+                                "first_name": row[idx_first_name],
+                                "prism_key": our_key,
+                                "chadwick_value": chadwick_val,
+                                "prism_value": our_val,
+                            }
+                        )
+                elif chadwick_val and chadwick_val != our_val:
+                    # Mismatch
+                    if not quiet:
                         print(
                             f"Row {idx}, {prism_id}: "
                             f"Diff {our_key}, Chadwick:{chadwick_val}, Prism:{our_val}. "
                             f"ignoring: {ignore_key}"
                         )
-                        if not ignore_key:
-                            issues.append(
-                                {
-                                    "prism_id": prism_id,
-                                    "last_name": row["last_name"],
-                                    "first_name": row["first_name"],
-                                    "prism_key": our_key,
-                                    "chadwick_value": chadwick_val,
-                                    "prism_value": our_val,
-                                }
-                            )
-    rows = rows // len(HEX_SUFFIXES)
+                    if not ignore_key:
+                        issues.append(
+                            {
+                                "prism_id": prism_id,
+                                "last_name": row[idx_last_name],
+                                "first_name": row[idx_first_name],
+                                "prism_key": our_key,
+                                "chadwick_value": chadwick_val,
+                                "prism_value": our_val,
+                            }
+                        )
     if issues:
         if not quiet:
             print(
@@ -212,7 +249,15 @@ if __name__ == "__main__":
         help="Path to a YAML file containing a dictionary of player IDs mapped "
         "to lists of keys that should be ignored/skipped",
     )
+    parser.add_argument(
+        "--verbose", action="store_true", help="Also report ignored keys"
+    )
     args = parser.parse_args()
     validate_csv(
-        args.csv_path, args.start, args.quiet, args.issues_file, args.ignores_file
+        args.csv_path,
+        args.start,
+        args.quiet,
+        args.issues_file,
+        args.ignores_file,
+        args.verbose,
     )
@@ -2,7 +2,6 @@ import argparse
 import csv
 import sys
 import time
-from datetime import datetime
 
 import requests
 
@@ -45,7 +44,7 @@ def write_issues_txt(issues: list[dict], outfile_path: str = "issues.txt") -> No
     - redirected (bool)
     - note (optional)
     """
-    now = datetime.utcnow().isoformat()
+    now = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime())
     header = [
         "## 🧭 Fangraphs ID Redirects Detected",
         "",
@@ -57,24 +56,15 @@ def write_issues_txt(issues: list[dict], outfile_path: str = "issues.txt") -> No
         "|----------|--------------|-----------|-----------|",
     ]
 
-    table_rows = []
-    csv_rows = []
-    for issue in issues:
-        table_rows.append(
-            f"| {issue['prism_id']} | {issue['last_name']}, {issue['first_name']} "
-            f"| {issue['old_fg_id']} | {issue.get('new_fg_id', '')} |"
-        )
-        # CSV update line (prism_id,new_fg_id)
-        csv_rows.append(f"{issue['prism_id']},{issue.get('new_fg_id', '')}")
-
-    csv_section = [
+    csv_section_start = [
         "",
         "### Suggested Edits",
         "",
         "You may want to change the following rows in `players.csv`:",
         "",
         "```csv",
-        *csv_rows,
+    ]
+    csv_section_end = [
         "```",
         "",
         "Please verify manually before updating.",
@@ -85,7 +75,17 @@ def write_issues_txt(issues: list[dict], outfile_path: str = "issues.txt") -> No
     ]
 
     with open(outfile_path, "w") as f:
-        f.write("\n".join(header + table_rows + csv_section))
+        f.write("\n".join(header))
+        for issue in issues:
+            f.write(
+                f"\n| {issue['prism_id']} | {issue['last_name']}, {issue['first_name']} "
+                f"| {issue['old_fg_id']} | {issue.get('new_fg_id', '')} |"
+            )
+        f.write("\n" + "\n".join(csv_section_start))
+        for issue in issues:
+            # CSV update line (prism_id,new_fg_id)
+            f.write(f"\n{issue['prism_id']},{issue.get('new_fg_id', '')}")
+        f.write("\n" + "\n".join(csv_section_end))
 
 
 def validate_csv(
@@ -104,9 +104,10 @@ def validate_csv(
                     print(f"Checking {fg_id}...")
                 new_id = check_redirect(fg_id)
                 if new_id:
-                    print(
-                        f"[ERROR] Row {idx}: Fangraphs {fg_id} now redirects to ID {new_id}"
-                    )
+                    if not quiet:
+                        print(
+                            f"[ERROR] Row {idx}: Fangraphs {fg_id} now redirects to ID {new_id}"
+                        )
                     issues.append(
                         {
                             "prism_id": row.get("prism_id", ""),
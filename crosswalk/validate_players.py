@@ -11,6 +11,15 @@ def load_yaml(path):
         return yaml.safe_load(f)
 
 
+def compile_rules(rules):
+    # Compile patterns and freeze enums once, rather than per row
+    if "pattern" in rules:
+        rules["pattern"] = re.compile(rules["pattern"])
+    if "enum" in rules:
+        rules["enum"] = frozenset(rules["enum"])
+    return rules
+
+
 def validate_field(value, rules, field_name, row_num):
     errors = []
 
@@ -22,14 +31,14 @@ def validate_field(value, rules, field_name, row_num):
         errors.append(f"Row {row_num}: '{field_name}' is required")
 
     # Check whitespace
-    if len(value) != len(value.strip()):
+    if value and (value[0].isspace() or value[-1].isspace()):
         errors.append(
             f"Row {row_num}: '{field_name}' contains leading/trailing whitespace."
         )
 
     # Validate pattern
     if "pattern" in rules and value:
-        if not re.fullmatch(rules["pattern"], value):
+        if not rules["pattern"].fullmatch(value):
             errors.append(
                 f"Row {row_num}: '{field_name}' value '{value}' does not match pattern"
             )
@@ -43,63 +52,84 @@ def validate_field(value, rules, field_name, row_num):
     return errors
 
 
-def check_duplicate_ids(id_field_name: str, id_val: any, seen_ids: set, line_idx: int):
-    errors = []
-
-    if not id_val:
-        return errors
-
-    if id_val in seen_ids:
-        errors.append(
-            f"Row {line_idx}: Duplicate value '{id_val}' for column '{id_field_name}'"
-        )
-    else:
-        seen_ids.add(id_val)
-    return errors
-
-
 def validate_csv(csv_path, core_schema_path, source_schema_path, fail_fast=False):
     errors = []
 
     # Load schemas
     core_schema = load_yaml(core_schema_path)["fields"]
     source_schema = load_yaml(source_schema_path)["players"]
+    for rules in core_schema.values():
+        compile_rules(rules)
+    for rules in source_schema:
+        compile_rules(rules)
 
     seen_ids = defaultdict(set)
 
+    # Resolve the checks for every column once, so the row loop doesn't
+    # re-inspect the schema. Each entry is (field, rules, active, seen ids),
+    # seen ids being None for columns that needn't be unique.
+    columns = [
+        # Metadata fields assumed to not be unique
+        (field, rules, rules.get("unique", False))
+        for field, rules in core_schema.items()
+    ] + [
+        # IDs are assumed to be unique
+        (s["id_field"], s, s.get("unique", True))
+        for s in source_schema
+    ]
+
     with open(csv_path, newline="") as f:
-        reader = csv.DictReader(f)
+        reader = csv.reader(f)
+        header = next(reader)
+        width = len(header)
+        idx_prism = header.index("prism_id")
+        # Columns missing from the file read as "", so idx is None for them
+        field_checks = [
+            (
+                field,
+                header.index(field) if field in header else None,
+                rules,
+                rules.get("active", True),
+                seen_ids[field] if unique else None,
+            )
+            for field, rules, unique in columns
+        ]
         prev_id = None
-        for i, row in enumerate(reader, start=2):  # start=2 to account for header
+        # start=2 to account for header. Blank lines are skipped (and not
+        # counted), as DictReader did.
+        for i, row in enumerate(filter(None, reader), start=2):
+            if len(row) != width:
+                errors.append(f"Row {i}: Expected {width} columns, found {len(row)}")
+                if fail_fast:
+                    print("\n".join(errors))
+                    sys.exit(1)
+                # Fields past the end of a short row are None, as in DictReader
+                row = row + [None] * (width - len(row))
             # Verify sorting
-            if prev_id and row.get("prism_id") < prev_id:
+            prism_id = row[idx_prism]
+            if prev_id is not None and prism_id < prev_id:
                 errors.append(
-                    f"Row {i}: Not sorted, ID '{row.get('prism_id')}' comes after '{prev_id}'"
+                    f"Row {i}: Not sorted, ID '{prism_id}' comes after '{prev_id}'"
                 )
                 if fail_fast and errors:
                     print("\n".join(errors))
                     sys.exit(1)
-            for field, rules in core_schema.items():
-                value = row.get(field, "")
-                errors.extend(validate_field(value, rules, field, i))
-                if rules.get("unique", False):
-                    # Metadata fields assumed to not be unique
-                    errors.extend(check_duplicate_ids(field, value, seen_ids[field], i))
-                if fail_fast and errors:
-                    print("\n".join(errors))
-                    sys.exit(1)
-            for s in source_schema:
-                field = s["id_field"]
-                rules = s
-                value = row.get(field, "")
-                errors.extend(validate_field(value, rules, field, i))
-                if rules.get("unique", True):
-                    # IDs are assumed to be unique
-                    errors.extend(check_duplicate_ids(field, value, seen_ids[field], i))
+            for field, idx, rules, active, seen in field_checks:
+                value = row[idx] if idx is not None else ""
+                if active:
+                    errors.extend(validate_field(value, rules, field, i))
+                if seen is not None and value:
+                    # A single set.add, the size only grows for unseen values
+                    before = len(seen)
+                    seen.add(value)
+                    if len(seen) == before:
+                        errors.append(
+                            f"Row {i}: Duplicate value '{value}' for column '{field}'"
+                        )
                 if fail_fast and errors:
                     print("\n".join(errors))
                     sys.exit(1)
-            prev_id = row["prism_id"]
+            prev_id = prism_id
 
     if errors:
         print(f"\nValidation failed with {len(errors)} errors:\n")
@@ -1,13 +1,18 @@
 import argparse
 import csv
-import io
+import os
 import sys
-from datetime import datetime
+import time
+from pathlib import Path
 
 import requests
 import yaml
 
 
+CACHE_DIR = "cache/sfbb"
+# Re-download the sheet once the cached copy is older than this (seconds)
+CACHE_MAX_AGE = 60 * 60
+
 # TODO externalize these in a yaml config?
 MAPPINGS = {
     # SFBB key : PRISM key
@@ -18,6 +23,7 @@ MAPPINGS = {
     "NFBCID": "nfbc_id",
     "YAHOOID": "yahoo_id",
 }
+MAPPING_ITEMS = tuple(MAPPINGS.items())
 
 
 def sfbb_url(
@@ -29,17 +35,24 @@ def sfbb_url(
     return url
 
 
-def download_sfbb_data():
-    url = sfbb_url()
-    response = requests.get(url)
-    # Force UTF-8 encoding, requests defaults to ISO-8859-1 if no charset is included
-    response.encoding = "utf-8"
-    if not response.ok:
-        print(f"Failed to fetch CSV. Status code: {response.status_code}")
-        response.raise_for_status()
+def download_sfbb_data(refresh=False, max_age=CACHE_MAX_AGE):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = Path(os.path.join(CACHE_DIR, "export.csv"))
+
+    if refresh or not path.exists() or time.time() - path.stat().st_mtime > max_age:
+        print("[sfbb] Downloading SFBB sheet")
+        url = sfbb_url()
+        response = requests.get(url)
+        if not response.ok:
+            print(f"Failed to fetch CSV. Status code: {response.status_code}")
+            response.raise_for_status()
+        with open(path, "wb") as f:
+            f.write(response.content)
 
-    reader = csv.DictReader(io.StringIO(response.text))
-    return list(reader)
+    # Always read as UTF-8, the export doesn't include a charset
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        return list(reader)
 
 
 def write_issues_txt(issues: list[dict], outfile_path: str = "issues.txt") -> None:
@@ -54,7 +67,7 @@ def write_issues_txt(issues: list[dict], outfile_path: str = "issues.txt") -> No
     - sfbb_value
     - prism_value
     """
-    now = datetime.utcnow().isoformat()
+    now = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime())
     header = [
         "## 📃 SFBB differences found",
         "",
@@ -66,16 +79,14 @@ def write_issues_txt(issues: list[dict], outfile_path: str = "issues.txt") -> No
         "|----------|--------------|-----------|------------|-------------|",
     ]
 
-    table_rows = []
-    for issue in issues:
-        table_rows.append(
-            f"| {issue['prism_id']} | {issue['last_name']}, {issue['first_name']} "
-            f"| {issue['prism_key']} | {issue['sfbb_value']} "
-            f"| {issue.get('prism_value', '')} |"
-        )
-
     with open(outfile_path, "w") as f:
-        f.write("\n".join(header + table_rows))
+        f.write("\n".join(header))
+        for issue in issues:
+            f.write(
+                f"\n| {issue['prism_id']} | {issue['last_name']}, {issue['first_name']} "
+                f"| {issue['prism_key']} | {issue['sfbb_value']} "
+                f"| {issue.get('prism_value', '')} |"
+            )
 
 
 def validate_csv(
@@ -84,6 +95,7 @@ def validate_csv(
     quiet: bool = False,
     issues_file: str = None,
     ignores_file: str = None,
+    refresh: bool = False,
 ):
     issues = []
     matches = 0
@@ -94,19 +106,38 @@ def validate_csv(
         with open(ignores_file, "r") as f:
             ignores = yaml.safe_load(f)
 
-    sfbb_data = download_sfbb_data()
+    sfbb_data = download_sfbb_data(refresh=refresh)
     sfbb_by_sfbb_id = {r["IDPLAYER"]: r for r in sfbb_data if len(r["IDPLAYER"]) > 0}
     sfbb_by_mlb_id = {r["MLBID"]: r for r in sfbb_data if len(r["MLBID"]) > 0}
 
     with open(csv_path, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for idx, row in enumerate(reader, start=1):
+        reader = csv.reader(f)
+        header = next(reader)
+        width = len(header)
+        # Columns missing from the file read as None, from a slot past the end
+        columns = {key: i for i, key in enumerate(header)}
+        idx_prism = columns.get("prism_id", width)
+        idx_mlbam = columns.get("mlbam_id", width)
+        idx_sfbb = columns.get("sfbb_id", width)
+        idx_last_name = header.index("last_name")
+        idx_first_name = header.index("first_name")
+        our_columns = [
+            (sfbb_key, our_key, columns.get(our_key, width))
+            for sfbb_key, our_key in MAPPING_ITEMS
+        ]
+        # Blank lines are skipped (and not counted), as DictReader did
+        for idx, row in enumerate(filter(None, reader), start=1):
             rows += 1
             if idx < start:
                 continue
-            sfbb_id = row.get("sfbb_id", None)
-            mlbam_id = row.get("mlbam_id", None)
-            prism_id = row.get("prism_id", None)
+            if len(row) == width:
+                row.append(None)
+            else:
+                # Fields past the end of a short row are None, as in DictReader
+                row = row[:width] + [None] * (width + 1 - min(len(row), width))
+            sfbb_id = row[idx_sfbb]
+            mlbam_id = row[idx_mlbam]
+            prism_id = row[idx_prism]
 
             found = sfbb_by_sfbb_id.get(sfbb_id, None) or sfbb_by_mlb_id.get(
                 mlbam_id, None
@@ -118,17 +149,17 @@ def validate_csv(
                 matches += 1
 
             # Check our ID mappings against SFBB's items
-            for sfbb_key, our_key in MAPPINGS.items():
-                is_ignore_key = False
-                if ignores.get(prism_id, None):
-                    if our_key in ignores[prism_id] or ignores[prism_id] == our_key:
-                        is_ignore_key = True
+            ignored_keys = ignores.get(prism_id) or ()
+            for sfbb_key, our_key, idx_our in our_columns:
+                is_ignore_key = our_key in ignored_keys or ignored_keys == our_key
                 sfbb_val = found.get(sfbb_key, None)
-                our_val = row.get(our_key, None)
+                our_val = row[idx_our]
 
                 if our_key == "fangraphs_id" and our_val != sfbb_val:
                     # HACK special handling of fangraphs_id differences
-                    if not our_val.startswith("sa") and sfbb_val.startswith("sa"):
+                    if not (our_val or "").startswith("sa") and (
+                        sfbb_val or ""
+                    ).startswith("sa"):
                         # assume our value is correct if sfbb has a sa prefix still and we don't
                         continue
                 if our_key == "bbref_id" and our_val != sfbb_val:
@@ -137,16 +168,17 @@ def validate_csv(
                         continue
                 if not our_val and sfbb_val:
                     # present in SFBB, not in PRISM
-                    print(
-                        f"Row {idx}, {prism_id}: Missing {our_key}, SFBB has {sfbb_val}. "
-                        f"Ignoring: {is_ignore_key}"
-                    )
+                    if not quiet:
+                        print(
+                            f"Row {idx}, {prism_id}: Missing {our_key}, SFBB has {sfbb_val}. "
+                            f"Ignoring: {is_ignore_key}"
+                        )
                     if not is_ignore_key:
                         issues.append(
                             {
                                 "prism_id": prism_id,
-                                "last_name": row["last_name"],
-                                "first_name": row["first_name"],
+                                "last_name": row[idx_last_name],
+                                "first_name": row[idx_first_name],
                                 "prism_key": our_key,
                                 "sfbb_value": sfbb_val,
                                 "prism_value": our_val,
@@ -154,17 +186,18 @@ def validate_csv(
                         )
                 elif sfbb_val and sfbb_val != our_val:
                     # Mismatch
-                    print(
-                        f"Row {idx}, {prism_id}: "
-                        f"Diff {our_key}. SFBB: {sfbb_val}, Prism: {our_val}. "
-                        f"Ignoring: {is_ignore_key}"
-                    )
+                    if not quiet:
+                        print(
+                            f"Row {idx}, {prism_id}: "
+                            f"Diff {our_key}. SFBB: {sfbb_val}, Prism: {our_val}. "
+                            f"Ignoring: {is_ignore_key}"
+                        )
                     if not is_ignore_key:
                         issues.append(
                             {
                                 "prism_id": prism_id,
-                                "last_name": row["last_name"],
-                                "first_name": row["first_name"],
+                                "last_name": row[idx_last_name],
+                                "first_name": row[idx_first_name],
                                 "prism_key": our_key,
                                 "sfbb_value": sfbb_val,
                                 "prism_value": our_val,
@@ -203,7 +236,15 @@ if __name__ == "__main__":
         help="Path to a YAML file containing a dictionary of player IDs mapped to "
         "lists of keys that should be ignored/skipped",
     )
+    parser.add_argument(
+        "--refresh", action="store_true", help="Re-download the SFBB sheet"
+    )
     args = parser.parse_args()
     validate_csv(
-        args.csv_path, args.start, args.quiet, args.issues_file, args.ignores_file
+        args.csv_path,
+        args.start,
+        args.quiet,
+        args.issues_file,
+        args.ignores_file,
+        args.refresh,
     )
@@ -3,20 +3,56 @@ import csv
 import importlib
 import json
 from collections import defaultdict
+from graphlib import TopologicalSorter
+from itertools import groupby
+from operator import itemgetter
 from pathlib import Path
 
 import yaml
 from jinja2 import Template
 
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    from yaml import CSafeLoader as SafeLoader
+except ImportError:
+    from yaml import SafeLoader
+
+
+COMPACT_BATCH_SIZE = 10_000
+
+
 def load_yaml(registry_path):
     with open(registry_path, "r", encoding="utf-8") as f:
-        return yaml.safe_load(f)
+        return yaml.load(f, Loader=SafeLoader)
 
 
 def load_json(crosswalk_path):
-    with open(crosswalk_path, "r", encoding="utf-8") as f:
-        return json.load(f)
+    with open(crosswalk_path, "rb") as f:
+        return orjson.loads(f.read()) if orjson else json.load(f)
+
+
+def json_dumps(obj, indent=False, newline=False):
+    # Serialize to UTF-8 bytes, with orjson when it's installed. The stdlib
+    # fallback produces identical output.
+    if orjson:
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if newline:
+            option |= orjson.OPT_APPEND_NEWLINE
+        return orjson.dumps(obj, option=option)
+    s = json.dumps(
+        obj,
+        indent=2 if indent else None,
+        separators=(",", ": ") if indent else (",", ":"),
+        ensure_ascii=False,
+    )
+    return (s + "\n" if newline else s).encode("utf-8")
 
 
 def load_source_module(name):
@@ -24,78 +60,94 @@ def load_source_module(name):
     return importlib.import_module(module_path)
 
 
-def preprocess_source(data, transformations):
-    for transform in transformations:
-        field = transform["field"]
-        template = transform["template"]
-        data[field] = Template(template).render(**data).strip()
+def compile_preprocess(transformations):
+    return [(t["field"], Template(t["template"])) for t in transformations]
+
+
+def preprocess_source(data, compiled):
+    # Pass data as the context dict itself rather than splatting it into
+    # kwargs. Each render still sees fields set by the transforms before it.
+    for field, template in compiled:
+        data[field] = template.render(data).strip()
     return data
 
 
+def index_players(intermediates, pivot_field):
+    index = defaultdict(list)
+    for player in intermediates:
+        index[player["crosswalk"].get(pivot_field)].append(player)
+    return index
+
+
 def build_intermediate(crosswalk, registry):
-    intermediates = defaultdict(dict)
-    for player in crosswalk:
-        intermediates[player["prism_id"]]["crosswalk"] = player
+    # One entry per crosswalk player, in crosswalk order
+    intermediates = [{"crosswalk": player} for player in crosswalk]
+    # {crosswalk_key: {pivot value: [players]}}, shared by sources on the same key
+    indexes = {}
     for source_name, source_conf in registry["sources"].items():
         pivot_field = source_conf["crosswalk_key"]
         module = load_source_module(source_name)
         print(f"Loading data from source: {source_name}. Pivot field: {pivot_field}")
         data = module.load()  # Assumes each loader defines `load() -> dict`
-        for player in intermediates.values():
-            field_val = player.get("crosswalk", {}).get(pivot_field, None)
+        # Templates are static per source, so parse them once, not per player
+        compiled = compile_preprocess(source_conf.get("preprocess", []))
+        if pivot_field not in indexes:
+            indexes[pivot_field] = index_players(intermediates, pivot_field)
+        for field_val, players in indexes[pivot_field].items():
             player_data = data.get(field_val, {})
-            if player_data:
-                player_data = preprocess_source(
-                    player_data, source_conf.get("preprocess", [])
-                )
-            player[source_name] = player_data
+            if compiled and player_data:
+                player_data = preprocess_source(player_data, compiled)
+            for player in players:
+                player[source_name] = player_data
     return intermediates
 
 
-def get_nested(data, path):
-    for key in path.split("."):
-        data = data.get(key, {})
-    return data if data else None
-
-
-def transform_field(intermediate, sources):
-    if isinstance(sources, str):
-        return get_nested(intermediate, sources)
-    for source in sources:
-        value = get_nested(intermediate, source)
-        if value:
-            return value
-    return value
-
-
-def transform_record(intermediate, mapping):
-    return {m["dest"]: transform_field(intermediate, m["src"]) for m in mapping}
+def compile_mappings(mappings):
+    # [(dest, [("source", "field", ...), ...])], with every src path split once
+    compiled = []
+    for m in mappings:
+        sources = [m["src"]] if isinstance(m["src"], str) else m["src"]
+        compiled.append((m["dest"], [tuple(s.split(".")) for s in sources]))
+    return compiled
 
 
 def transform_records(intermediates, registry):
+    mappings = compile_mappings(registry["mappings"])
     outputs = []
-    for intermediate in intermediates.values():
+    for intermediate in intermediates:
         output = dict(intermediate["crosswalk"])
-        output.update(transform_record(intermediate, registry["mappings"]))
+        # Each dest takes its first non-empty source. The lookups are inlined
+        # since this runs for every field of every player.
+        for dest, paths in mappings:
+            value = None
+            for path in paths:
+                data = intermediate
+                for key in path:
+                    data = data.get(key, {})
+                if data:
+                    value = data
+                    break
+            output[dest] = value
         outputs.append(output)
     return outputs
 
 
 def parse_fieldsets(registry):
     input_fieldsets = registry["fieldsets"]
+    graph = {name: fs.get("fieldsets", []) for name, fs in input_fieldsets.items()}
     fieldsets = {}
 
-    # Get names + fields
-    for name, fieldset in input_fieldsets.items():
-        fieldsets[name] = list(fieldset.get("fields", []))
-
-    # Do fieldsets
-    for name, fieldset in input_fieldsets.items():
+    # Expand each fieldset after the fieldsets it includes, so nested
+    # references are always fully expanded (raises CycleError on a cycle)
+    for name in TopologicalSorter(graph).static_order():
+        fieldset = input_fieldsets[name]
+        fields = list(fieldset.get("fields", []))
         for src_fieldset in fieldset.get("fieldsets", []):
-            fieldsets[name].extend(fieldsets[src_fieldset])
+            fields.extend(fieldsets[src_fieldset])
+        # Get unique fields, preserving order
+        fieldsets[name] = list(dict.fromkeys(fields))
 
-    # Get unique fields, preserving order
-    return {f: list(dict.fromkeys(v)) for f, v in fieldsets.items()}
+    return {name: fieldsets[name] for name in input_fieldsets}
 
 
 def parse_product_fields(product, fieldsets):
@@ -115,57 +167,88 @@ def parse_product_fields(product, fieldsets):
     return list(dict.fromkeys(fields))
 
 
-def nest_fields(flat_row):
-    nested = {}
-    for k, v in flat_row.items():
-        parts = k.split(".")
-        current = nested
+def compile_nest_paths(fields):
+    # Nest the dotted field names once per product, e.g. ["a", "b.c"] becomes
+    # [("a", "a", None), ("b", None, [("c", "b.c", None)])], so each row is
+    # nested by filling in the same skeleton
+    tree = {}
+    for f in fields:
+        parts = f.split(".")
+        current = tree
         for part in parts[:-1]:
             current = current.setdefault(part, {})
-        current[parts[-1]] = v
-    return nested
-
+        current[parts[-1]] = f
+    return tree_to_paths(tree)
 
-def filter_and_nest_row(row, fields):
-    return nest_fields({f: row.get(f, None) for f in fields})
 
+def tree_to_paths(tree):
+    return [
+        (k, v, None) if isinstance(v, str) else (k, None, tree_to_paths(v))
+        for k, v in tree.items()
+    ]
 
-def filter_and_nest_rows(rows, fields):
-    return [filter_and_nest_row(r, fields) for r in rows]
 
+def filter_and_nest_row(row, nest_paths):
+    # Convert dot notation to nested objects
+    return {
+        key: row.get(field, None) if sub is None else filter_and_nest_row(row, sub)
+        for key, field, sub in nest_paths
+    }
 
-def write_outputs(name, output_dir, transformed, fields):
-    output_dir.mkdir(parents=True, exist_ok=True)
 
-    # CSV
-    with open(output_dir / f"{name}.csv", "w", newline="") as f:
-        writer = csv.DictWriter(
-            f, extrasaction="ignore", fieldnames=[f.replace(".", "_") for f in fields]
-        )
-        writer.writeheader()
-        for row in transformed:
-            filtered = {f.replace(".", "_"): row.get(f, "") for f in fields}
-            writer.writerow(filtered)
-
-    # Filter data + convert dot notation to nested objects
-    filtered_data = filter_and_nest_rows(transformed, fields)
-
-    # Pretty JSON
-    with open(output_dir / f"{name}.json", "w") as f:
-        json.dump(filtered_data, f, indent=2, ensure_ascii=False)
+def filter_and_nest_rows(rows, fields):
+    nest_paths = compile_nest_paths(fields)
+    return [filter_and_nest_row(r, nest_paths) for r in rows]
 
-    # Minified JSON
-    with open(output_dir / f"{name}.min.json", "w") as f:
-        json.dump(filtered_data, f, separators=(",", ":"), ensure_ascii=False)
 
-    # NDJSON
-    with open(output_dir / f"{name}.ndjson", "w") as f:
-        for row in filtered_data:
-            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+def write_compact_lines(lines, ndjson_f, min_f):
+    # NDJSON, and minified JSON as the same lines joined by ","
+    if not lines:
+        return
+    ndjson_f.writelines(lines)
+    # Anything past the opening "[" means an earlier batch needs a separator
+    if min_f.tell() > 1:
+        min_f.write(b",")
+    min_f.write(b",".join(memoryview(line)[:-1] for line in lines))
 
 
-def write_pivot(product_name, pivot_name, pivot_dir, pivot_field, data, output_fields):
-    pivot_on = pivot_field["field"]
+def write_outputs(name, output_dir, transformed, nested_rows, fields):
+    output_dir.mkdir(parents=True, exist_ok=True)
+    flat_fields = [f.replace(".", "_") for f in fields]
+
+    # Every format is written in the same pass over the rows
+    with (
+        open(output_dir / f"{name}.csv", "w", newline="") as csv_f,
+        open(output_dir / f"{name}.json", "wb") as json_f,
+        open(output_dir / f"{name}.min.json", "wb") as min_f,
+        open(output_dir / f"{name}.ndjson", "wb") as ndjson_f,
+    ):
+        writer = csv.writer(csv_f)
+        writer.writerow(flat_fields)
+        min_f.write(b"[")
+        lines = []
+        empty = True
+        for row, nested in zip(transformed, nested_rows):
+            # CSV
+            writer.writerow([row.get(f, "") for f in fields])
+
+            # Pretty JSON, the same as indenting the whole list at once
+            json_f.write(b"[\n  " if empty else b",\n  ")
+            json_f.write(json_dumps(nested, indent=True).replace(b"\n", b"\n  "))
+            empty = False
+
+            # Compact lines are written in batches rather than one per row
+            lines.append(json_dumps(nested, newline=True))
+            if len(lines) == COMPACT_BATCH_SIZE:
+                write_compact_lines(lines, ndjson_f, min_f)
+                lines = []
+        write_compact_lines(lines, ndjson_f, min_f)
+        json_f.write(b"[]" if empty else b"\n]")
+        min_f.write(b"]")
+
+
+def write_pivot(product_name, pivot_name, pivot_dir, pivot_field, keyed):
+    # keyed is [(stringified pivot value, row, nested row)] in data order
     # TODO don't see needing below 2 levels of nesting but...
     # making pivots recursive would be cleaner
     pivot_subfield = pivot_field.get("subfield", None)
@@ -173,33 +256,35 @@ def write_pivot(product_name, pivot_name, pivot_dir, pivot_field, data, output_f
     is_array = pivot_field.get("is_array", True)
     null_key = pivot_field.get("null_key", None)
 
-    if pivot_subfield:
-        outputs = defaultdict(lambda: defaultdict(list if is_array else None))
-    else:
-        outputs = defaultdict(list if is_array else None)
-    for row in data:
-        row_key = row.get(pivot_on, None)
-        row_key = row_key if row_key else null_key
-        if not row_key:
-            continue
-
-        if pivot_subfield:
-            parent = outputs[row_key]
-            row_key = row.get(pivot_subfield, None)
-            row_key = row_key if row_key else null_key
+    # Sort once (stably, so rows keep their order within a key), then build the
+    # output group by group
+    keyed.sort(key=itemgetter(0))
+
+    # Plain dicts throughout, branching on the pivot's shape per key rather
+    # than per row
+    sorted_output = {}
+    for row_key, group in groupby(keyed, key=itemgetter(0)):
+        if not pivot_subfield and is_array:
+            sorted_output[row_key] = [row_data for _, _, row_data in group]
+        elif not pivot_subfield:
+            for _, _, row_data in group:
+                # TODO consider warning if we're overwriting an existing key
+                sorted_output[row_key] = row_data
+        elif is_array:
+            parent = sorted_output[row_key] = {}
+            for _, row, row_data in group:
+                sub_key = row.get(pivot_subfield, None)
+                sub_key = sub_key if sub_key else null_key
+                parent.setdefault(sub_key, []).append(row_data)
         else:
-            parent = outputs
+            parent = sorted_output[row_key] = {}
+            for _, row, row_data in group:
+                sub_key = row.get(pivot_subfield, None)
+                sub_key = sub_key if sub_key else null_key
+                parent[sub_key] = row_data
 
-        row_data = filter_and_nest_row(row, output_fields)
-        if is_array:
-            parent[row_key].append(row_data)
-        else:
-            # TODO consider warning if we're overwriting an existing key
-            parent[row_key] = row_data
-
-    sorted_output = dict(sorted((str(k), v) for k, v in outputs.items()))
-    with open(pivot_dir / f"{pivot_field_name}.json", "w") as f:
-        json.dump(sorted_output, f, indent=2, ensure_ascii=False)
+    with open(pivot_dir / f"{pivot_field_name}.json", "wb") as f:
+        f.write(json_dumps(sorted_output, indent=True))
 
 
 def resolve_pivot_spec(pivot_spec, shared_pivots):
@@ -211,7 +296,11 @@ def resolve_pivot_spec(pivot_spec, shared_pivots):
         raise ValueError(f"Unsupported pivot format: {pivot_spec}")
 
 
-def write_pivots(name, output_dir, transformed, fields, product, shared_pivots):
+def write_pivots(name, output_dir, transformed, nested_rows, product, shared_pivots):
+    # (pivot_name, pivot_dir, pivot_field, keyed rows) per pivot field, and
+    # the (field, null_key, keyed rows) needed to key a row for each of them
+    pivot_specs = []
+    pivot_keys = []
     for p in product.get("pivots", []):
         pivot = resolve_pivot_spec(p, shared_pivots)
         pivot_name = pivot["name"]
@@ -220,7 +309,22 @@ def write_pivots(name, output_dir, transformed, fields, product, shared_pivots):
 
         for pivot_field in pivot_fields:
             pivot_dir.mkdir(parents=True, exist_ok=True)
-            write_pivot(name, pivot_name, pivot_dir, pivot_field, transformed, fields)
+            keyed = []
+            pivot_specs.append((pivot_name, pivot_dir, pivot_field, keyed))
+            pivot_keys.append(
+                (pivot_field["field"], pivot_field.get("null_key", None), keyed)
+            )
+
+    # Key the rows for every pivot field in a single pass
+    for row, row_data in zip(transformed, nested_rows):
+        for pivot_on, null_key, keyed in pivot_keys:
+            row_key = row.get(pivot_on, None)
+            row_key = row_key if row_key else null_key
+            if row_key:
+                keyed.append((str(row_key), row, row_data))
+
+    for pivot_name, pivot_dir, pivot_field, keyed in pivot_specs:
+        write_pivot(name, pivot_name, pivot_dir, pivot_field, keyed)
 
 
 def parse_args():
@@ -250,7 +354,12 @@ def main():
     intermediate = build_intermediate(crosswalk, registry)
     if args.dump_intermediate:
         with (output_dir / "intermediate.json").open("w", encoding="utf-8") as f:
-            json.dump(intermediate, f, indent=2, ensure_ascii=False)
+            json.dump(
+                {p["crosswalk"]["prism_id"]: p for p in intermediate},
+                f,
+                indent=2,
+                ensure_ascii=False,
+            )
         print("Intermediate data written to exports/intermediate.json")
 
     transformed = transform_records(intermediate, registry)
@@ -263,8 +372,10 @@ def main():
         product_dir.mkdir(exist_ok=True, parents=True)
 
         if fields:
-            write_outputs(name, product_dir, transformed, fields)
-            write_pivots(name, product_dir, transformed, fields, product, shared_pivots)
+            # Nest once per product, shared by the outputs and the pivots
+            nested = filter_and_nest_rows(transformed, fields)
+            write_outputs(name, product_dir, transformed, nested, fields)
+            write_pivots(name, product_dir, transformed, nested, product, shared_pivots)
 
     print(f"Build complete. Outputs written to {output_dir}/")
 
@@ -0,0 +1,54 @@
+import json
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# (response header, request header, sidecar suffix) used to revalidate cached
+# files with a conditional GET
+VALIDATORS = [
+    ("ETag", "If-None-Match", ".etag"),
+    ("Last-Modified", "If-Modified-Since", ".lastmod"),
+]
+
+
+def make_session(pool_size):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    return session
+
+
+def validator_headers(path):
+    path = Path(path)
+    if not path.exists():
+        return {}
+    headers = {}
+    for _, request_header, suffix in VALIDATORS:
+        sidecar = path.with_suffix(suffix)
+        if sidecar.exists():
+            headers[request_header] = sidecar.read_text(encoding="utf-8")
+    return headers
+
+
+def save_validators(path, response):
+    path = Path(path)
+    for response_header, _, suffix in VALIDATORS:
+        sidecar = path.with_suffix(suffix)
+        value = response.headers.get(response_header)
+        if value:
+            sidecar.write_text(value, encoding="utf-8")
+        else:
+            sidecar.unlink(missing_ok=True)
+
+
+def read_json(path):
+    with open(path, "rb") as f:
+        return orjson.loads(f.read()) if orjson else json.load(f)
@@ -2,9 +2,12 @@ import csv
 import os
 import random
 import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 
 import requests
+from sources._http import make_session, save_validators, validator_headers
 
 
 CACHE_DIR = "cache/chadwick"
@@ -14,43 +17,55 @@ SOURCE_URL_TEMPLATE = (
     "master/data/people-{suffix}.csv"
 )
 HEX_SUFFIXES = [f"{i:x}" for i in range(16)]  # ['0', '1', ..., 'f']
+MAX_WORKERS = 8
 
 
-def load_file(suffix, refresh=False):
+def load_file(suffix, refresh=False, session=requests):
     os.makedirs(CACHE_DIR, exist_ok=True)
     path = Path(os.path.join(CACHE_DIR, f"people-{suffix}.csv"))
 
     if not path.exists() or refresh:
         print(f"[chadwick] Downloading people-{suffix}.csv")
         url = SOURCE_URL_TEMPLATE.format(suffix=suffix)
-        response = requests.get(url)
-        response.raise_for_status()
-        with open(path, "wb") as f:
-            f.write(response.content)
+        response = session.get(url, headers=validator_headers(path))
+        if response.status_code == 304:
+            print(f"[chadwick] people-{suffix}.csv is unchanged")
+        else:
+            response.raise_for_status()
+            with open(path, "wb") as f:
+                f.write(response.content)
+            save_validators(path, response)
+        time.sleep(random.uniform(0.5, 1.5))
     else:
         print(f"[chadwick] Using cached file for people-{suffix}")
 
     people = {}
-    # Load from disk
+    # Load from disk. Most people have no MLBAM id, so only rows with a key
+    # are turned into dicts
     with open(path, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+        reader = csv.reader(f)
+        header = next(reader)
+        key_idx = header.index("key_mlbam")
         for row in reader:
-            key = row["key_mlbam"].strip()
+            if not row:
+                continue
+            key = row[key_idx].strip()
             if key:
-                people[key] = row
+                people[key] = dict(zip(header, row))
     return people
 
 
 def load(refresh=False):
     all_players = {}
 
-    for suffix in HEX_SUFFIXES:
-        player_data = load_file(suffix, refresh=refresh)
-
-        for id, player in player_data.items():
-            all_players[str(id)] = player
-
-        if refresh:
-            time.sleep(random.uniform(0.5, 1.5))
+    # Shards are fetched in parallel, but merged in suffix order
+    with (
+        make_session(MAX_WORKERS) as session,
+        ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor,
+    ):
+        load_shard = partial(load_file, refresh=refresh, session=session)
+        for player_data in executor.map(load_shard, HEX_SUFFIXES):
+            for id, player in player_data.items():
+                all_players[str(id)] = player
 
     return all_players
@@ -2,8 +2,16 @@ import json
 import os
 import random
 import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
 import requests
+from sources._http import (
+    make_session,
+    read_json,
+    save_validators,
+    validator_headers,
+)
 
 
 CACHE_DIR = "cache/mlbam_people"
@@ -13,67 +21,91 @@ SPORT_ID_RANGES = [
     range(11, 14 + 1),
     range(16, 16 + 1),
 ]
-SPORT_IDS = set().union(*SPORT_ID_RANGES)
+SPORT_IDS = sorted(set().union(*SPORT_ID_RANGES))
 
 SOURCE_URL_TEMPLATE = "https://statsapi.mlb.com/api/v1/sports/{sport_id}/players"
 
 TEAMS_URL_TEMPLATE = "https://statsapi.mlb.com/api/v1/teams?sportId={sport_id}"
 
+MAX_WORKERS = 8
 
-def load_teams(sport_id, refresh=False):
+
+def load_teams(sport_id, refresh=False, session=requests):
     os.makedirs(CACHE_DIR, exist_ok=True)
     path = os.path.join(CACHE_DIR, f"teams_{sport_id}.json")
 
-    if not refresh and os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+    if refresh or not os.path.exists(path):
+        url = TEAMS_URL_TEMPLATE.format(sport_id=sport_id)
+        response = session.get(url, headers=validator_headers(path))
+        time.sleep(random.uniform(0.75, 1.5))
+        if response.status_code != 304:
+            response.raise_for_status()
+            data = response.json()
 
-    url = TEAMS_URL_TEMPLATE.format(sport_id=sport_id)
-    response = requests.get(url)
-    response.raise_for_status()
-    data = response.json()
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            save_validators(path, response)
 
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+            return data
 
-    return data
+    return read_json(path)
 
 
 def map_teams_by_id(teams_data):
     return {t["id"]: t for t in teams_data["teams"]}
 
 
-def load_sport(sport_id, refresh=False):
+def load_sport(sport_id, refresh=False, session=requests):
     os.makedirs(CACHE_DIR, exist_ok=True)
     path = os.path.join(CACHE_DIR, f"{sport_id}.json")
 
-    if not refresh and os.path.exists(path):
+    if refresh or not os.path.exists(path):
+        print(f"[mlbam_people] Downloading players for {sport_id}")
+        url = SOURCE_URL_TEMPLATE.format(sport_id=sport_id)
+        response = session.get(url, headers=validator_headers(path))
+        time.sleep(random.uniform(0.75, 1.5))
+        if response.status_code != 304:
+            response.raise_for_status()
+            data = response.json()
+
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            save_validators(path, response)
+
+            return data
+        print(f"[mlbam_people] Players for {sport_id} are unchanged")
+    else:
         print(f"[mlbam_people] Using cached data for {sport_id}")
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-
-    print(f"[mlbam_people] Downloading players for {sport_id}")
-    url = SOURCE_URL_TEMPLATE.format(sport_id=sport_id)
-    response = requests.get(url)
-    response.raise_for_status()
-    data = response.json()
-
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
 
-    return data
+    return read_json(path)
 
 
 def load(refresh=False):
     all_players = {}
 
-    parent_teams = load_teams(sport_id=1, refresh=refresh)
-    parent_teams_by_id = map_teams_by_id(parent_teams)
-
-    for sport_id in SPORT_IDS:
-        sport_data = load_sport(sport_id=sport_id, refresh=refresh)
-        teams_data = load_teams(sport_id=sport_id, refresh=refresh)
-        teams_by_id = map_teams_by_id(teams_data)
+    # Parent orgs are the sport 1 teams, so every sport's teams (including
+    # sport 1) are loaded and mapped exactly once
+    team_sport_ids = sorted({1, *SPORT_IDS})
+
+    # Sports are fetched in parallel, but merged in SPORT_IDS order
+    with (
+        make_session(MAX_WORKERS) as session,
+        ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor,
+    ):
+        load_sport_teams = partial(load_teams, refresh=refresh, session=session)
+        teams = executor.map(load_sport_teams, team_sport_ids)
+        load_players = partial(load_sport, refresh=refresh, session=session)
+        sports = executor.map(load_players, SPORT_IDS)
+
+        teams_by_sport = {
+            sport_id: map_teams_by_id(teams_data)
+            for sport_id, teams_data in zip(team_sport_ids, teams)
+        }
+        sports = list(zip(SPORT_IDS, sports))
+    parent_teams_by_id = teams_by_sport[1]
+
+    for sport_id, sport_data in sports:
+        teams_by_id = teams_by_sport[sport_id]
 
         for person in sport_data.get("people", []):
             player_id = person["id"]
@@ -91,7 +123,4 @@ def load(refresh=False):
             if player_id:
                 all_players[str(player_id)] = person
 
-        if refresh:
-            time.sleep(random.uniform(0.75, 1.5))
-
     return all_players
@@ -2,14 +2,22 @@ import json
 import os
 import random
 import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 
 import requests
+from sources._http import (
+    make_session,
+    read_json,
+    save_validators,
+    validator_headers,
+)
 
 
 CACHE_DIR = "cache/mlbam_rosters"
 
 TEAM_ID_RANGES = [range(108, 121 + 1), range(133, 147 + 1), range(158, 159)]
-TEAM_IDS = set().union(*TEAM_ID_RANGES)
+TEAM_IDS = sorted(set().union(*TEAM_ID_RANGES))
 
 SOURCE_URL_TEMPLATE = (
     "https://statsapi.mlb.com/api/v1/teams/{team_id}/roster/"
@@ -18,57 +26,70 @@ SOURCE_URL_TEMPLATE = (
 
 TEAMS_URL = "https://statsapi.mlb.com/api/v1/teams?sportId=1"
 
+MAX_WORKERS = 8
+
 
-def load_teams(refresh=False):
+def load_teams(refresh=False, session=requests):
     os.makedirs(CACHE_DIR, exist_ok=True)
     path = os.path.join(CACHE_DIR, "teams.json")
 
-    if not refresh and os.path.exists(path):
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
+    if refresh or not os.path.exists(path):
+        response = session.get(TEAMS_URL, headers=validator_headers(path))
+        if response.status_code != 304:
+            response.raise_for_status()
+            data = response.json()
 
-    response = requests.get(TEAMS_URL)
-    response.raise_for_status()
-    data = response.json()
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            save_validators(path, response)
 
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+            return data
 
-    return data
+    return read_json(path)
 
 
 def map_teams_by_id(teams_data):
     return {t["id"]: t for t in teams_data["teams"]}
 
 
-def load_team(team_id, refresh=False):
+def load_team(team_id, refresh=False, session=requests):
     os.makedirs(CACHE_DIR, exist_ok=True)
     path = os.path.join(CACHE_DIR, f"{team_id}.json")
 
-    if not refresh and os.path.exists(path):
+    if refresh or not os.path.exists(path):
+        print(f"[mlb_rosters] Downloading roster for {team_id}")
+        url = SOURCE_URL_TEMPLATE.format(team_id=team_id)
+        response = session.get(url, headers=validator_headers(path))
+        time.sleep(random.uniform(0.75, 1.5))
+        if response.status_code != 304:
+            response.raise_for_status()
+            data = response.json()
+
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump(data, f, indent=2, ensure_ascii=False)
+            save_validators(path, response)
+
+            return data
+        print(f"[mlb_rosters] Roster for {team_id} is unchanged")
+    else:
         print(f"[mlb_rosters] Using cached roster for {team_id}")
-        with open(path, "r", encoding="utf-8") as f:
-            return json.load(f)
-
-    print(f"[mlb_rosters] Downloading roster for {team_id}")
-    url = SOURCE_URL_TEMPLATE.format(team_id=team_id)
-    response = requests.get(url)
-    response.raise_for_status()
-    data = response.json()
 
-    with open(path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
-
-    return data
+    return read_json(path)
 
 
 def load(refresh=False):
     all_players = {}
 
-    teams_by_id = map_teams_by_id(load_teams(refresh=refresh))
+    # Rosters are fetched in parallel, but merged in TEAM_IDS order
+    with (
+        make_session(MAX_WORKERS) as session,
+        ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor,
+    ):
+        teams_by_id = map_teams_by_id(load_teams(refresh=refresh, session=session))
+        load_roster = partial(load_team, refresh=refresh, session=session)
+        rosters = list(zip(TEAM_IDS, executor.map(load_roster, TEAM_IDS)))
 
-    for team_id in TEAM_IDS:
-        team_data = load_team(team_id, refresh=refresh)
+    for team_id, team_data in rosters:
         team_info = teams_by_id.get(team_id, {})
 
         for player in team_data.get("roster", []):
@@ -77,7 +98,4 @@ def load(refresh=False):
             if player_id:
                 all_players[str(player_id)] = player
 
-        if refresh:
-            time.sleep(random.uniform(0.75, 1.5))
-
     return all_players
@@ -3,6 +3,7 @@ import os
 from pathlib import Path
 
 import requests
+from sources._http import save_validators, validator_headers
 
 
 CACHE_DIR = "cache/sfbb"
@@ -21,19 +22,27 @@ def load(refresh=False):
 
     if not path.exists() or refresh:
         print("[sfbb] Downloading players csv")
-        response = requests.get(SOURCE_URL)
-        response.raise_for_status()
-        with open(path, "wb") as f:
-            f.write(response.content)
+        response = requests.get(SOURCE_URL, headers=validator_headers(path))
+        if response.status_code == 304:
+            print("[sfbb] players csv is unchanged")
+        else:
+            response.raise_for_status()
+            with open(path, "wb") as f:
+                f.write(response.content)
+            save_validators(path, response)
     else:
         print("[sfbb] Using cached file for players csv")
 
     people = {}
-    # Load from disk
+    # Load from disk, only turning rows with a key into dicts
     with open(path, newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+        reader = csv.reader(f)
+        header = next(reader)
+        key_idx = header.index("MLBID")
         for row in reader:
-            key = row["MLBID"].strip()
+            if not row:
+                continue
+            key = row[key_idx].strip()
             if key:
-                people[key] = row
+                people[key] = dict(zip(header, row))
     return people